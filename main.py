@@ -1,40 +1,79 @@
 import polars as pl
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from ortools.sat.python import cp_model
-from src.analysis import calculate_friend_scores
+from src.analysis import calculate_friend_scores, extract_assignments
 from src.cleaning import (
     get_centers_from_adults_df,
     get_youth_from_buddy_form_df,
     all_parents_are_valid,
     all_friends_are_valid,
     get_historical_youth_leaders,
+    attach_past_leaders,
+    read_csv_cached,
 )
 from src.config import Config
+from src.models import YouthTable
 from src.writer import write_results_to_csv
 from src.analysis import print_crew_assignments, status_to_string
-from src.linear_program.lp_model import create_crew_assignment_model
+from src.linear_program.lp_model import configure_solver, load_or_create_crew_assignment_model
 
 
 def main():
-    # Parse command line arguments
+    # Parse command line arguments; solver defaults come from Config so the two cannot drift apart
+    defaults = Config()
     parser = argparse.ArgumentParser(description='Run crew assignment optimization')
     parser.add_argument('-y', '--year', type=int, required=True, help='Year for the crew assignments')
+    parser.add_argument(
+        '-w',
+        '--workers',
+        type=int,
+        default=defaults.num_workers,
+        help='Number of CP-SAT search workers (default: min(16, CPU count))',
+    )
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible solver runs')
+    parser.add_argument(
+        '--linearization-level',
+        type=int,
+        choices=[0, 1, 2],
+        default=None,
+        help='CP-SAT linearization level; 2 adds more LP relaxation (default: solver default)',
+    )
+    parser.add_argument(
+        '-t',
+        '--time-limit',
+        type=float,
+        default=defaults.time_limit,
+        help='Solver wall-clock limit in seconds (default: 300)',
+    )
+    parser.add_argument(
+        '--optimize-with-core', action='store_true', help='Use core-based search, which works on the objective bound'
+    )
+    parser.add_argument(
+        '--first-feasible', action='store_true', help='Stop at the first feasible solution instead of optimizing'
+    )
+    parser.add_argument(
+        '--no-model-cache',
+        action='store_true',
+        help='Build the model from scratch and delete the cached model snapshot in data/cache',
+    )
     args = parser.parse_args()
 
     year = args.year
 
-    # Read and process data
-    adult_crew_df = pl.read_csv(f'./data/clean/crews_{year}.csv').filter(pl.col('role') != 'Youth')
-    youth_df = pl.read_csv(f'./data/clean/buddies_{year}.csv')
-    historical_pairings_df = pl.read_csv('./data/clean/historical_crews.csv')
+    # Read the input files concurrently; polars releases the GIL while parsing
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        crews_future = executor.submit(read_csv_cached, f'./data/clean/crews_{year}.csv')
+        youth_future = executor.submit(read_csv_cached, f'./data/clean/buddies_{year}.csv')
+        historical_future = executor.submit(read_csv_cached, './data/clean/historical_crews.csv')
+    adult_crew_df = crews_future.result().filter(pl.col('role') != 'Youth')
+    youth_df = youth_future.result()
+    historical_pairings_df = historical_future.result()
     youth_list = get_youth_from_buddy_form_df(youth_df)
     centers = get_centers_from_adults_df(adult_crew_df)
 
     # Update youth list with past leaders
-    historical_youth_leaders = get_historical_youth_leaders(historical_pairings_df)
-    for youth in youth_list:
-        if youth.name in historical_youth_leaders:
-            youth.past_leaders = historical_youth_leaders[youth.name]
+    attach_past_leaders(youth_list, get_historical_youth_leaders(historical_pairings_df))
 
     all_parents_are_valid(youth_df, adult_crew_df)
     all_friends_are_valid(youth_list)
@@ -46,33 +85,41 @@ def main():
     print(f'Youth with siblings: {len([y for y in youth_list if y.siblings_list])}')
     print(f'Centers: {[(c.name, len(c.crews)) for c in centers]}')
 
-    cfg = Config.default()
+    cfg = Config(
+        time_limit=args.time_limit,
+        num_workers=args.workers,
+        random_seed=args.seed,
+        linearization_level=args.linearization_level,
+        optimize_with_core=args.optimize_with_core,
+        stop_after_first_solution=args.first_feasible,
+    )
 
     # Create and solve model
-    model, person_center, person_crew = create_crew_assignment_model(cfg, youth_list, centers)
+    model, person_center, person_crew = load_or_create_crew_assignment_model(
+        cfg, youth_list, centers, use_cache=not args.no_model_cache
+    )
 
-    solver = cp_model.CpSolver()
-    # solver.parameters.max_time_in_seconds = 300.0
-    solver.parameters.num_search_workers = 8
-    solver.parameters.log_search_progress = True
+    solver = configure_solver(cp_model.CpSolver(), cfg)
     status = solver.Solve(model)
 
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
         print(f'Solution found! Status: {status_to_string(status)}')
-        print_crew_assignments(solver, person_crew, person_center, youth_list, centers)
-        write_results_to_csv(solver, person_crew, youth_list, centers, year=year)
+        assignments = extract_assignments(solver, person_crew, youth_list, centers)
+        youth_table = YouthTable.from_youth_list(youth_list)
+        print_crew_assignments(assignments, youth_table, centers)
+        write_results_to_csv(assignments, youth_list, centers, year=year)
+
+        center_scores, avg_score = calculate_friend_scores(assignments, youth_table, centers)
+        print('=' * 50)
+        print('Algorithm Friend Scores:')
+        print(f'Center scores: {center_scores}')
+        print(f'Average score: {avg_score}')
     else:
         print(f'No solution found. Status: {status_to_string(status)}')
         # Print some stats about the failed solve
         print('Statistics:')
         print(solver.ResponseStats())
 
-    center_scores, avg_score = calculate_friend_scores(solver, person_center, youth_list, centers)
-    print('=' * 50)
-    print('Algorithm Friend Scores:')
-    print(f'Center scores: {center_scores}')
-    print(f'Average score: {avg_score}')
-
 
 if __name__ == '__main__':
     main()
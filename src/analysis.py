@@ -1,76 +1,104 @@
 from ortools.sat.python import cp_model
-from src.models import Center, Youth
+from src.cleaning import read_csv_cached
+from src.models import GENDERS, HISTORIES, YEARS, Center, Youth, YouthTable
+import numpy as np
 import polars as pl
 
 
-def calculate_friend_scores(
+def extract_assignments(
     solver: cp_model.CpSolver,
-    person_center: dict[tuple[str, str], int],
+    person_crew: dict[tuple[str, str, str], int],
     youth_list: list[Youth],
     centers: list[Center],
+) -> np.ndarray:
+    """Sweep the solver's person_crew values once into a (num_youth, 2) array of (center_idx, crew_idx).
+
+    Youth without a crew assignment get (-1, -1). Every analysis helper reads from this array
+    instead of querying the solver again.
+    """
+    assignments = np.full((len(youth_list), 2), -1, dtype=np.int32)
+    for youth_idx, youth in enumerate(youth_list):
+        for center_idx, center in enumerate(centers):
+            crew_idx = next(
+                (
+                    i
+                    for i, crew in enumerate(center.crews)
+                    if solver.Value(person_crew[youth.name, center.name, crew.name]) == 1
+                ),
+                None,
+            )
+            if crew_idx is not None:
+                assignments[youth_idx] = (center_idx, crew_idx)
+                break
+    return assignments
+
+
+def calculate_friend_scores(
+    assignments: np.ndarray,
+    youth_table: YouthTable,
+    centers: list[Center],
 ) -> tuple[dict[str, float], float]:
-    center_scores = {center.name: 0.0 for center in centers}
-    center_people_count = {center.name: 0 for center in centers}
-    youth_dict = {youth.name: youth for youth in youth_list}
-    # Calculate raw scores and count people in each center
-    for youth in youth_list:
-        for center in centers:
-            if solver.Value(person_center[youth.name, center.name]) == 1:
-                center_people_count[center.name] += 1
-
-                # Calculate friendship scores
-                friend_weights = {
-                    youth.first_choice: 3,
-                    youth.second_choice: 2,
-                    youth.third_choice: 1,
-                }
-                for friend_name, weight in friend_weights.items():
-                    if friend_name and friend_name in youth_dict:
-                        if solver.Value(person_center[friend_name, center.name]) == 1:
-                            center_scores[center.name] += weight
+    youth_center = assignments[:, 0]
+    assigned = youth_center >= 0
+    center_scores = np.zeros(len(centers))
+    center_people_count = np.bincount(youth_center[assigned], minlength=len(centers))
+
+    # A friend listed more than once only counts with the weight of the last choice it appears in
+    first, second, third = youth_table.first_idx, youth_table.second_idx, youth_table.third_idx
+    friend_weights = [
+        (first, 3, (first >= 0) & (first != second) & (first != third)),
+        (second, 2, (second >= 0) & (second != third)),
+        (third, 1, third >= 0),
+    ]
+    for friend_idx, weight, valid in friend_weights:
+        same_center = valid & assigned & (youth_center[friend_idx] == youth_center)
+        center_scores += weight * np.bincount(youth_center[same_center], minlength=len(centers))
+
     # Normalize scores by number of people
     normalized_scores = {
-        center.name: round(center_scores[center.name] / center_people_count[center.name], 2)
-        if center_people_count[center.name] > 0
+        center.name: round(center_scores[i].item() / center_people_count[i].item(), 2)
+        if center_people_count[i] > 0
         else 0.0
-        for center in centers
+        for i, center in enumerate(centers)
     }
-    avg_score = round(sum(center_scores.values()) / len(youth_list), 2)
+    avg_score = round(center_scores.sum().item() / len(youth_table.names), 2)
 
     return normalized_scores, avg_score
 
 
 def calculate_historical_friend_scores(centers: list[Center], year: int) -> tuple[dict[str, float], float]:
-    youth_df = pl.read_csv(f'./data/clean/crews_{year}.csv').filter(pl.col('role') != 'Adult')
-    buddies_df = pl.read_csv(f'./data/clean/buddies_{year}.csv')
+    youth_df = read_csv_cached(f'./data/clean/crews_{year}.csv').filter(pl.col('role') != 'Adult')
+    buddies_df = read_csv_cached(f'./data/clean/buddies_{year}.csv')
     youth_buddies_df = youth_df.join(buddies_df, on='name', how='left')
     center_scores = {center.name: 0.0 for center in centers}
     center_people_count = {center.name: 0 for center in centers}
     overall_score = 0
     youth_list = youth_buddies_df['name'].to_list()
+    # Build the name -> center lookup once instead of filtering the frame per friend
+    center_of = dict(zip(youth_list, youth_buddies_df['Center'].to_list()))
 
     for youth in youth_buddies_df.iter_rows(named=True):
-        for center in centers:
-            if youth['Center'] == center.name:
-                center_people_count[center.name] += 1
-
-                # Calculate friendship scores
-                friend_weights = {
-                    youth['first_choice']: 3,
-                    youth['second_choice']: 2,
-                    youth['third_choice']: 1,
-                }
-                for friend_name, weight in friend_weights.items():
-                    # Skip if friend_name is None or empty string
-                    if not friend_name:
-                        continue
-
-                    if friend_name in youth_list:
-                        friend_center = youth_buddies_df.filter(pl.col('name') == friend_name)
-                        # Check if friend exists and has a center assignment
-                        if len(friend_center) > 0 and friend_center[0, 'Center'] == center.name:
-                            center_scores[center.name] += weight
-                            overall_score += weight
+        # Each youth belongs to exactly one center, so skip those outside the requested centers
+        center_name = youth['Center']
+        if center_name not in center_scores:
+            continue
+        center_people_count[center_name] += 1
+
+        # Calculate friendship scores
+        friend_weights = {
+            youth['first_choice']: 3,
+            youth['second_choice']: 2,
+            youth['third_choice']: 1,
+        }
+        for friend_name, weight in friend_weights.items():
+            # Skip if friend_name is None or empty string
+            if not friend_name:
+                continue
+
+            # Check if friend exists and has a center assignment
+            if center_of.get(friend_name) == center_name:
+                center_scores[center_name] += weight
+                overall_score += weight
 
     normalized_scores = {
         center.name: round(center_scores[center.name] / center_people_count[center.name], 2)
@@ -82,39 +110,25 @@ def calculate_historical_friend_scores(centers: list[Center], year: int) -> tupl
     return normalized_scores, avg_score
 
 
-def calculate_friend_choice_stats(solver, person_center, youth_list, centers):
+def calculate_friend_choice_stats(assignments, youth_table, centers):
     """Calculate statistics about friend choice fulfillment."""
-    youth_dict = {youth.name: youth for youth in youth_list}
-    stats = {
-        'first_choice': 0,
-        'second_choice': 0,
-        'third_choice': 0,
-        'multiple_friends': 0,
-        'total_youth': len(youth_list),
-    }
-
-    for youth in youth_list:
-        friends_with = 0
-        choices = [
-            (youth.first_choice, 'first_choice'),
-            (youth.second_choice, 'second_choice'),
-            (youth.third_choice, 'third_choice'),
-        ]
-
-        for friend_name, choice_type in choices:
-            if friend_name and friend_name in youth_dict:
-                # Check if they're in the same center
-                for center in centers:
-                    if (
-                        solver.Value(person_center[youth.name, center.name]) == 1
-                        and solver.Value(person_center[friend_name, center.name]) == 1
-                    ):
-                        stats[choice_type] += 1
-                        friends_with += 1
-                        break
-
-        if friends_with > 1:
-            stats['multiple_friends'] += 1
+    youth_center = assignments[:, 0]
+    assigned = youth_center >= 0
+    stats = {'total_youth': len(youth_table.names)}
+
+    # Compare each youth's center with each friend's center directly; no per-center scan needed
+    friends_with = np.zeros(len(youth_table.names), dtype=np.int32)
+    choices = [
+        (youth_table.first_idx, 'first_choice'),
+        (youth_table.second_idx, 'second_choice'),
+        (youth_table.third_idx, 'third_choice'),
+    ]
+    for friend_idx, choice_type in choices:
+        same_center = (friend_idx >= 0) & assigned & (youth_center[friend_idx] == youth_center)
+        stats[choice_type] = int(same_center.sum())
+        friends_with += same_center
+
+    stats['multiple_friends'] = int((friends_with > 1).sum())
 
     # Convert to percentages
     total = stats['total_youth']
@@ -126,49 +140,52 @@ def calculate_friend_choice_stats(solver, person_center, youth_list, centers):
     }
 
 
-def print_crew_assignments(solver, person_crew, person_center, youth_list, centers):
-    youth_dict = {youth.name: youth for youth in youth_list}
-    friend_scores, _ = calculate_friend_scores(solver, person_center, youth_list, centers)
+def count_by_crew(
+    codes: np.ndarray, assignments: np.ndarray, centers: list[Center], num_values: int
+) -> list[np.ndarray]:
+    """Histogram integer attribute codes for every crew in a single bincount.
+
+    Returns one (num_crews, num_values) count array per center, indexed by crew_idx.
+    """
+    crew_offsets = np.cumsum([0] + [len(center.crews) for center in centers])
+    assigned = assignments[:, 0] >= 0
+    flat_crew = crew_offsets[assignments[assigned, 0]] + assignments[assigned, 1]
+    counts = np.bincount(flat_crew * num_values + codes[assigned], minlength=crew_offsets[-1] * num_values)
+    counts = counts.reshape(crew_offsets[-1], num_values)
+    return [counts[crew_offsets[i] : crew_offsets[i + 1]] for i in range(len(centers))]
+
+
+def print_crew_assignments(assignments, youth_table, centers):
+    friend_scores, _ = calculate_friend_scores(assignments, youth_table, centers)
+
+    # Calculate crew diversity metrics for all crews at once
+    year_hists = count_by_crew(youth_table.year_code, assignments, centers, len(YEARS))
+    gender_hists = count_by_crew(youth_table.gender_code, assignments, centers, len(GENDERS))
+    history_hists = count_by_crew(youth_table.history_code, assignments, centers, len(HISTORIES))
 
     # Track center-level statistics
     center_stats = {}
 
-    for center in centers:
+    for center_idx, center in enumerate(centers):
         print(f'\nCenter {center.name}:')
-        center_youth = []
         center_stats[center.name] = {
             'total_youth': 0,
             'total_adults': 0,
-            'years': {'Fr': 0, 'So': 0, 'Jr': 0, 'Sr': 0},
-            'gender': {'M': 0, 'F': 0},
-            'history': {'V': 0, 'N': 0},
+            'years': dict(zip(YEARS, year_hists[center_idx].sum(axis=0).tolist())),
+            'gender': dict(zip(GENDERS, gender_hists[center_idx].sum(axis=0).tolist())),
+            'history': dict(zip(HISTORIES, history_hists[center_idx].sum(axis=0).tolist())),
             'friend_score': friend_scores[center.name],
         }
 
-        for crew in center.crews:
-            crew_youth = [
-                youth.name for youth in youth_list if solver.Value(person_crew[youth.name, center.name, crew.name]) == 1
-            ]
-            center_youth.extend(crew_youth)
-
-            # Calculate crew diversity metrics
-            years = [youth_dict[person].year for person in crew_youth]
-            year_counts = {}
-            for year in years:
-                year_counts[year] = year_counts.get(year, 0) + 1
-                center_stats[center.name]['years'][year] += 1
-
-            genders = [youth_dict[person].gender for person in crew_youth]
-            gender_counts = {}
-            for gender in genders:
-                gender_counts[gender] = gender_counts.get(gender, 0) + 1
-                center_stats[center.name]['gender'][gender] += 1
-
-            histories = [youth_dict[person].history for person in crew_youth]
-            history_counts = {}
-            for history in histories:
-                history_counts[history] = history_counts.get(history, 0) + 1
-                center_stats[center.name]['history'][history] += 1
+        for crew_idx, crew in enumerate(center.crews):
+            crew_mask = (assignments[:, 0] == center_idx) & (assignments[:, 1] == crew_idx)
+            crew_youth = [youth_table.names[i] for i in np.flatnonzero(crew_mask)]
+
+            year_counts = {year: n for year, n in zip(YEARS, year_hists[center_idx][crew_idx].tolist()) if n}
+            gender_counts = {gender: n for gender, n in zip(GENDERS, gender_hists[center_idx][crew_idx].tolist()) if n}
+            history_counts = {
+                history: n for history, n in zip(HISTORIES, history_hists[center_idx][crew_idx].tolist()) if n
+            }
 
             print(f'  {crew.name}:')
             print(f'    Youth: {crew_youth}')
@@ -191,7 +208,7 @@ def print_crew_assignments(solver, person_crew, person_center, youth_list, cente
     print(f'Total Participants: {total_youth + total_adults}')
 
     # Add friend choice statistics
-    friend_stats = calculate_friend_choice_stats(solver, person_center, youth_list, centers)
+    friend_stats = calculate_friend_choice_stats(assignments, youth_table, centers)
     print('\nFriend Choice Statistics:')
     print(f'Youth with first choice friend: {friend_stats["first_choice_pct"]}%')
     print(f'Youth with second choice friend: {friend_stats["second_choice_pct"]}%')
@@ -1,28 +1,69 @@
+import dataclasses
 import polars as pl
 import os
+import tempfile
+from collections import defaultdict
 from src.models import Center, Crew, Youth
 
 
-def get_full_name_lookup(df: pl.DataFrame) -> dict[str, str]:
-    """Create a lookup dictionary for last names (and last, first initial) to full names."""
-    lookup = {}
+def read_csv_cached(csv_path: str) -> pl.DataFrame:
+    """Read a CSV through a Parquet snapshot stored next to it.
 
-    # Get all name combinations
-    for row in df.iter_rows(named=True):
-        full_name = row['full_name']
-        last_name = row['last_name'].strip()
-        first_name = row['full_name'].split()[0]
+    The snapshot is used while it is at least as new as the CSV; otherwise the CSV is parsed
+    and the snapshot is rewritten, so edits to the CSV are always picked up. A snapshot that cannot
+    be read (e.g. truncated) is treated the same as a stale one. Writing the snapshot is best-effort
+    and atomic (temp file, then os.replace): on a read-only or shared directory the parsed CSV is
+    returned as is, and an interrupted write never leaves a partial snapshot behind.
+    """
+    parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+    if os.path.exists(parquet_path) and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+        try:
+            return pl.read_parquet(parquet_path)
+        except (OSError, pl.exceptions.PolarsError):
+            pass  # fall through and rebuild the snapshot from the CSV
+    df = pl.read_csv(csv_path)
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(parquet_path) or '.', suffix='.parquet.tmp')
+        os.close(fd)
+        try:
+            df.write_parquet(tmp_path)
+            os.replace(tmp_path, parquet_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except OSError:
+        pass
+    return df
+
+
+def clean_name(expr: pl.Expr) -> pl.Expr:
+    """Collapse the first whitespace run, title-case and trim a string expression.
+
+    Every cleaning step goes through this one expression chain so names stay identical across the
+    buddy forms, crew rosters and historical crews (and with clean files written before).
+    """
+    return expr.str.replace(r'\s+', ' ').str.to_titlecase().str.strip_chars()
 
-        # Add simple last name lookup
-        lookup[last_name] = full_name
 
-        # Add "Last, F" format lookup
-        lookup[f'{last_name}, {first_name[0]}'] = full_name
+def get_full_name_lookup(df: pl.DataFrame) -> dict[str, str]:
+    """Create a lookup dictionary for last names (and last, first initial) to full names."""
+    last_name = pl.col('last_name').str.strip_chars()
+    keys = df.select(
+        last_name.alias('last_name'),
+        pl.concat_str(
+            [last_name, pl.col('full_name').str.split(' ').list.get(0).str.slice(0, 1)], separator=', '
+        ).alias('last_initial'),
+        pl.col('full_name'),
+    )
+    full_names = keys['full_name'].to_list()
 
+    # Simple last name lookup, then "Last, F" format lookup
+    lookup = dict(zip(keys['last_name'].to_list(), full_names))
+    lookup.update(zip(keys['last_initial'].to_list(), full_names))
     return lookup
 
 
-def buddy_forms_get_youth_rows(df: pl.DataFrame) -> pl.DataFrame:
+def buddy_forms_get_youth_rows(df: pl.LazyFrame) -> pl.LazyFrame:
     buddies = (
         df.filter(pl.col('Grade').is_not_null())  # filters down to youth only
         .with_columns(
@@ -42,66 +83,62 @@ def buddy_forms_get_youth_rows(df: pl.DataFrame) -> pl.DataFrame:
         )
     )
 
-    # Clean spaces
+    # Clean spaces on every string column in a single with_columns pass
+    schema = buddies.collect_schema()
     buddies_clean = buddies.with_columns(
-        [
-            pl.col(col).str.replace(r'\s+', ' ').str.to_titlecase().str.strip_chars().alias(col)
-            for col in buddies.columns
-            if buddies.schema[col] == pl.Utf8
-        ]
-    )
+        [clean_name(pl.col(col)) for col in schema.names() if schema[col] == pl.Utf8]
+    ).collect()
 
-    # Create name lookup
+    # Create name lookup (needs the cleaned names materialized once)
     name_lookup = get_full_name_lookup(buddies_clean)
 
-    # Convert friend choices to full names
-    buddies_clean = buddies_clean.with_columns(
+    # Convert friend choices to full names; unmatched choices become null. The lookup is turned into
+    # old/new Series once and shared by all three columns instead of re-converting the dict per column
+    lookup_keys = pl.Series(list(name_lookup.keys()), dtype=pl.Utf8)
+    lookup_names = pl.Series(list(name_lookup.values()), dtype=pl.Utf8)
+    return buddies_clean.lazy().with_columns(
         [
-            pl.col('first_choice')
-            .map_elements(lambda x: name_lookup.get(x, None), return_dtype=pl.Utf8)
-            .alias('first_choice'),
-            pl.col('second_choice')
-            .map_elements(lambda x: name_lookup.get(x, None), return_dtype=pl.Utf8)
-            .alias('second_choice'),
-            pl.col('third_choice')
-            .map_elements(lambda x: name_lookup.get(x, None), return_dtype=pl.Utf8)
-            .alias('third_choice'),
+            pl.col(col).replace_strict(lookup_keys, lookup_names, default=None, return_dtype=pl.Utf8).alias(col)
+            for col in ('first_choice', 'second_choice', 'third_choice')
         ]
     )
 
-    return buddies_clean
-
 
-def get_siblings(youth_df: pl.DataFrame) -> pl.DataFrame:
-    all_sibs = youth_df.filter(pl.col('par_sib').str.contains('S')).select(pl.col('full_name'), pl.col('last_name'))
-    siblings_map = all_sibs.group_by('last_name').agg(pl.col('full_name').alias('siblings_all'))
+def get_siblings() -> pl.Expr:
+    """Siblings of each youth flagged with 'S' in par_sib, as a List[Utf8] column (null for everyone else).
 
-    sibs_out = (
-        all_sibs.join(siblings_map, on='last_name')
-        .with_columns(siblings=pl.col('siblings_all').list.set_difference(pl.col('full_name').str.split('||')))
-        .select(pl.col('full_name'), pl.col('siblings'))
-        .with_columns(pl.concat_str(pl.col('siblings').list.join('|')))
-        .with_columns(pl.col('siblings').fill_null('None'))
+    A window over last_name restricted to the flagged rows, minus the youth themself, so the column is
+    computed in place on the youth frame without a self-join. It is only joined with '|' when written to CSV.
+    """
+    has_siblings = pl.col('par_sib').str.contains('S')
+    return (
+        pl.when(has_siblings)
+        .then(
+            pl.col('full_name')
+            .filter(has_siblings)
+            .over('last_name', mapping_strategy='join')
+            .list.set_difference(pl.concat_list(pl.col('full_name')))
+        )
+        .alias('siblings')
     )
-    return sibs_out
 
 
-def get_parent_names(youth_df: pl.DataFrame, year: int) -> pl.DataFrame:
+def get_parent_names(youth_df: pl.LazyFrame, year: int) -> pl.LazyFrame:
     """Get parent names for youth by matching last names with adult crew members.
 
     Args:
-        youth_df: DataFrame with youth data including par_sib column
+        youth_df: LazyFrame with youth data including par_sib column
         year: Year of the crews data
 
     Returns:
-        DataFrame with full_name and parent_name columns
+        LazyFrame with full_name and parent_name columns
     """
     crews_path = f'./data/clean/crews_{year}.csv'
     if not os.path.exists(crews_path):
         raise ValueError(f'Crews file {crews_path} does not exist')
 
     # Read crew data and filter for adults only
-    crews_df = pl.read_csv(crews_path)
+    crews_df = pl.scan_csv(crews_path)
     # Not filtering for only adults because we want to include young adults because they lead crews too
     adults_df = crews_df.with_columns([pl.col('name').str.split(' ').list.last().alias('last_name')]).select(
         ['name', 'last_name']
@@ -127,17 +164,18 @@ def clean_asp_buddies(raw_path: str, year: int) -> None:
     if not os.path.exists(raw_path) or not raw_path.endswith('.csv'):
         raise ValueError(f'File {raw_path} does not exist or is not a csv')
 
-    raw_buddy_df = pl.read_csv(raw_path)
+    raw_buddy_df = pl.scan_csv(raw_path)
     youth_df = buddy_forms_get_youth_rows(raw_buddy_df)
-    siblings_df = get_siblings(youth_df)
     parents_df = get_parent_names(youth_df, year)
 
     youth_df_out = (
-        youth_df.join(siblings_df, on='full_name', how='left')
+        youth_df.with_columns(get_siblings())
         .join(parents_df, on='full_name', how='left')
-        .with_columns(pl.col('parent_name').fill_null(''))
+        # The clean CSV stores siblings as a pipe-separated string
+        .with_columns(pl.col('siblings').list.join('|'), pl.col('parent_name').fill_null(''))
         .rename({'full_name': 'name'})
         .drop('last_name', 'par_sib')
+        .collect(streaming=True)
     )
     youth_df_out.write_csv(f'./data/clean/buddies_{year}.csv')
 
@@ -145,18 +183,18 @@ def clean_asp_buddies(raw_path: str, year: int) -> None:
 def clean_historical_crews(raw_path: str, year: int) -> None:
     if not os.path.exists(raw_path) or not raw_path.endswith('.csv'):
         raise ValueError(f'File {raw_path} does not exist or is not a csv')
-    df = pl.read_csv(raw_path)
+    df = pl.scan_csv(raw_path)
     df_out = df.select(
-        pl.col("Participant's Name").alias('name'),
+        clean_name(pl.col("Participant's Name")).alias('name'),
         pl.col('Center'),
         pl.col('Crew'),
         pl.col('I am registering for this ASP trip as:').alias('role'),
-    ).with_columns(pl.col('name').str.replace(r'\s+', ' ').str.to_titlecase().str.strip_chars())
-    df_out.write_csv(f'./data/clean/crews_{year}.csv')
+    )
+    df_out.collect(streaming=True).write_csv(f'./data/clean/crews_{year}.csv')
 
 
 def clean_historical_crews_old(historical_crew_path: str, year: int) -> None:
-    historical_crews_df = pl.read_csv(historical_crew_path)
+    historical_crews_df = pl.scan_csv(historical_crew_path)
     cleaned_historical_df = (
         historical_crews_df.rename(
             {"Participant's Name - Last Name": 'last_name', "Participant's Name - First Name": 'first_name'}
@@ -166,51 +204,75 @@ def clean_historical_crews_old(historical_crew_path: str, year: int) -> None:
             crew_year=pl.concat_str([pl.col('Crew'), pl.lit(year)], separator=' '),
         )
         .with_columns((pl.col('name') == pl.col('name').str.to_uppercase()).fill_null(False).alias('is_adult'))
-        .with_columns(pl.col('name').str.replace(r'\s+', ' ').str.to_titlecase().str.strip_chars().alias('name'))
+        .with_columns(clean_name(pl.col('name')))
         .select(['name', 'crew_year', 'is_adult'])
     )
-    cleaned_historical_df.write_csv(f'./data/clean/historical_crews_{year}.csv')
+    cleaned_historical_df.collect(streaming=True).write_csv(f'./data/clean/historical_crews_{year}.csv')
 
 
 def get_historical_youth_leaders(all_historical_crews: pl.DataFrame) -> dict[str, list[str]]:
-    adult_df = all_historical_crews.filter(pl.col('is_adult')).drop('is_adult').rename({'name': 'adult_name'})
-    youth_df = all_historical_crews.filter(~pl.col('is_adult')).drop('is_adult').rename({'name': 'youth_name'})
+    # Lazy so both sides of the self-join share one scan of the source frame
+    historical = all_historical_crews.lazy()
     youth_pairings_df = (
-        youth_df.join(adult_df, on='crew_year', how='left')
-        .group_by('youth_name')
-        .agg(pl.col('adult_name').alias('adult_names'))
+        historical.filter(~pl.col('is_adult'))
+        .join(historical.filter(pl.col('is_adult')), on='crew_year', how='left', suffix='_adult')
+        .group_by('name')
+        .agg(pl.col('name_adult').alias('adult_names'))
+        .collect()
     )
-    return {row['youth_name']: row['adult_names'] for row in youth_pairings_df.iter_rows(named=True)}
+    return dict(zip(youth_pairings_df['name'].to_list(), youth_pairings_df['adult_names'].to_list()))
+
+
+def attach_past_leaders(youth_list: list[Youth], historical_youth_leaders: dict[str, list[str]]) -> None:
+    """Set past_leaders on every youth that appears in the historical leader lookup."""
+    for youth in youth_list:
+        past_leaders = historical_youth_leaders.get(youth.name)
+        if past_leaders is not None:
+            youth.past_leaders = past_leaders
 
 
 def get_centers_from_adults_df(adult_crews: pl.DataFrame) -> list[Center]:
-    centers: list[Center] = []
-    center_df = adult_crews.group_by('Center').agg(pl.col('Crew'))
-    for center_row in center_df.iter_rows(named=True):
-        this_center = center_row['Center']
-        crews: list[Crew] = []
-        crew_df = adult_crews.filter(pl.col('Center') == this_center).group_by('Crew').agg(pl.col('name'))
-        for crew_row in crew_df.iter_rows(named=True):
-            crew = Crew(name=crew_row['Crew'], adults=crew_row['name'])
-            crews.append(crew)
-        centers.append(Center(name=this_center, crews=crews))
-    return centers
+    # One aggregation over (Center, Crew), sorted so centers and crews come out in the same order on every run
+    grouped = adult_crews.group_by(['Center', 'Crew']).agg(pl.col('name').alias('adults')).sort(['Center', 'Crew'])
+
+    # Single pass over the aggregated rows, bucketing crews by center
+    crews_by_center: defaultdict[str, list[Crew]] = defaultdict(list)
+    for center_name, crew_name, adults in grouped.select('Center', 'Crew', 'adults').iter_rows():
+        crews_by_center[center_name].append(Crew(name=crew_name, adults=adults))
+    return [Center(name=center_name, crews=crews) for center_name, crews in crews_by_center.items()]
 
 
 def get_youth_from_buddy_form_df(youth: pl.DataFrame) -> list[Youth]:
-    return [Youth(**row) for row in youth.iter_rows(named=True)]
+    # Bind the positional Youth field order once and pass each row tuple straight to Youth, with no per-row dict.
+    # Missing trailing columns keep their defaults; a gap in the middle would shift values, so reject it
+    positional = [field.name for field in dataclasses.fields(Youth) if field.init and not field.kw_only]
+    fields = [name for name in positional if name in youth.columns]
+    if fields != positional[: len(fields)]:
+        raise ValueError(f'Buddy form is missing Youth columns: {sorted(set(positional[: len(fields)]) - set(fields))}')
+    if youth.schema.get('siblings') == pl.Utf8:
+        # The clean CSV stores siblings '|'-joined; split them back into the list column Youth takes as-is
+        siblings = pl.col('siblings')
+        youth = youth.with_columns(
+            pl.when(siblings != '').then(siblings.str.split('|')).otherwise(pl.lit([], dtype=pl.List(pl.Utf8)))
+        )
+    return [Youth(*values) for values in youth.select(fields).iter_rows()]
 
 
 def all_parents_are_valid(youth_df: pl.DataFrame, adult_df: pl.DataFrame) -> bool:
-    adult_names = adult_df['name'].to_list()
-    missing_parents = []
-    for row in youth_df.iter_rows(named=True):
-        if row['parent_name']:
-            # Handle multiple parents separated by pipe
-            parent_names = row['parent_name'].split('|') if row['parent_name'] else []
-            for parent_name in parent_names:
-                if parent_name and parent_name not in adult_names:
-                    missing_parents.append(f"{row['name']}'s parent {parent_name}")
+    # A parent may be an adult in the crews file or a young adult on the buddy form (role defaults to Youth)
+    known_parents = adult_df['name']
+    if 'role' in youth_df.columns:
+        known_parents = pl.concat([known_parents, youth_df.filter(pl.col('role') == 'Young Adult')['name']])
+    # Handle multiple parents separated by pipe
+    missing_parents = (
+        youth_df.filter(pl.col('parent_name').is_not_null() & (pl.col('parent_name') != ''))
+        .select(pl.col('name'), pl.col('parent_name').str.split('|'))
+        .explode('parent_name')
+        .filter((pl.col('parent_name') != '') & ~pl.col('parent_name').is_in(known_parents))
+        .select(pl.format("{}'s parent {}", pl.col('name'), pl.col('parent_name')))
+        .to_series()
+        .to_list()
+    )
     if missing_parents:
         raise ValueError(f'Missing parents in adult crews: {", ".join(missing_parents)}')
     return True
@@ -218,14 +280,24 @@ def all_parents_are_valid(youth_df: pl.DataFrame, adult_df: pl.DataFrame) -> boo
 
 def all_friends_are_valid(youth_list: list[Youth]) -> bool:
     """Check if all friend choices reference valid youth names."""
-    valid_names = {youth.name for youth in youth_list}
-    missing_friends = []
-
-    for youth in youth_list:
-        friend_choices = [youth.first_choice, youth.second_choice, youth.third_choice]
-        for choice in friend_choices:
-            if choice and choice not in valid_names:
-                missing_friends.append(f"{youth.name}'s friend {choice}")
+    choice_cols = ['first_choice', 'second_choice', 'third_choice']
+    choices_df = pl.DataFrame(
+        {col: [getattr(youth, col) for youth in youth_list] for col in ['name', *choice_cols]},
+        schema={col: pl.Utf8 for col in ['name', *choice_cols]},
+    )
+    # Besides other youth, a friend may be a young adult or one of the youth's past leaders
+    young_adults = [youth.name for youth in youth_list if youth.role == 'Young Adult']
+    past_leaders = [leader for youth in youth_list for leader in youth.past_leaders]
+    known_friends = pl.Series([*choices_df['name'], *young_adults, *past_leaders], dtype=pl.Utf8)
+    missing_friends = (
+        choices_df.with_row_index()
+        .unpivot(index=['index', 'name'], on=choice_cols, value_name='choice')
+        .filter(pl.col('choice').is_not_null() & (pl.col('choice') != '') & ~pl.col('choice').is_in(known_friends))
+        .sort('index', maintain_order=True)  # report in youth order, then choice order
+        .select(pl.format("{}'s friend {}", pl.col('name'), pl.col('choice')))
+        .to_series()
+        .to_list()
+    )
 
     if missing_friends:
         raise ValueError(f'Invalid friend choices found: {", ".join(missing_friends)}')
@@ -237,32 +309,25 @@ def clean_crews_2025_raw(raw_path: str, year: int) -> None:
     if not os.path.exists(raw_path) or not raw_path.endswith('.csv'):
         raise ValueError(f'File {raw_path} does not exist or is not a csv')
 
-    df = pl.read_csv(raw_path)
+    df = pl.scan_csv(raw_path)
 
     center_mapping = {'F': 'Fayette', 'K': 'Kanawha', 'N': 'Nicholas', 'L': 'Leslie'}
 
-    df_out = (
-        df.with_columns(
-            [
-                # Combine first and last name
-                pl.concat_str([pl.col('First Name'), pl.col('Last Name')], separator=' ').alias('name'),
-                # Map crew first letter to center name
-                pl.col('Crew').str.slice(0, 1).replace(center_mapping).alias('Center'),
-                # Convert crew names to 2-digit format (F01, F02, etc.)
-                pl.concat_str([pl.col('Crew').str.slice(0, 1), pl.col('Crew').str.slice(1).str.zfill(2)]).alias('Crew'),
-                # Convert YA to Young Adult, keep Adult as is
-                pl.when(pl.col('Adult/YA') == 'YA')
-                .then(pl.lit('Young Adult'))
-                .otherwise(pl.col('Adult/YA'))
-                .alias('role'),
-            ]
-        )
-        .select(['name', 'Center', 'Crew', 'role'])
-        # Clean up name formatting - remove extra spaces and convert to title case
-        .with_columns([pl.col('name').str.replace(r'\s+', ' ').str.to_titlecase().str.strip_chars()])
-    )
+    df_out = df.with_columns(
+        [
+            # Combine first and last name
+            # Clean up name formatting - remove extra spaces and convert to title case
+            clean_name(pl.concat_str([pl.col('First Name'), pl.col('Last Name')], separator=' ')).alias('name'),
+            # Map crew first letter to center name
+            pl.col('Crew').str.slice(0, 1).replace(center_mapping).alias('Center'),
+            # Convert crew names to 2-digit format (F01, F02, etc.)
+            pl.concat_str([pl.col('Crew').str.slice(0, 1), pl.col('Crew').str.slice(1).str.zfill(2)]).alias('Crew'),
+            # Convert YA to Young Adult, keep Adult as is
+            pl.when(pl.col('Adult/YA') == 'YA').then(pl.lit('Young Adult')).otherwise(pl.col('Adult/YA')).alias('role'),
+        ]
+    ).select(['name', 'Center', 'Crew', 'role'])
 
-    df_out.write_csv(f'./data/clean/crews_{year}.csv')
+    df_out.collect(streaming=True).write_csv(f'./data/clean/crews_{year}.csv')
 
 
 def convert_crews_to_historical(crews_path: str, year: int) -> None:
@@ -275,7 +340,7 @@ def convert_crews_to_historical(crews_path: str, year: int) -> None:
     if not os.path.exists(crews_path) or not crews_path.endswith('.csv'):
         raise ValueError(f'File {crews_path} does not exist or is not a csv')
 
-    crews_df = pl.read_csv(crews_path)
+    crews_df = pl.scan_csv(crews_path)
 
     historical_df = crews_df.with_columns(
         [
@@ -287,7 +352,10 @@ def convert_crews_to_historical(crews_path: str, year: int) -> None:
     historical_path = './data/clean/historical_crews.csv'
     if not os.path.exists(historical_path):
         # Create new file if it doesn't exist
-        historical_df.write_csv(historical_path)
+        historical_df.collect(streaming=True).write_csv(historical_path)
         return
-    existing_df = pl.read_csv(historical_path)
-    pl.concat([existing_df, historical_df]).unique().write_csv(historical_path)
+    existing_df = pl.scan_csv(historical_path)
+    # Dedupe on the key columns only; a re-converted year replaces its earlier rows.
+    # Collect before writing since the output overwrites one of the inputs.
+    merged_df = pl.concat([existing_df, historical_df]).unique(subset=['name', 'crew_year'], keep='last')
+    merged_df.collect(streaming=True).write_csv(historical_path)
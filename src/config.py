@@ -1,7 +1,8 @@
 from dataclasses import dataclass
+import os
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Config:
     """Configuration for crew assignment model."""
 
@@ -15,6 +16,15 @@ class Config:
     year_weight: int = 1  # Weight for year diversity
     history_weight: int = 1  # Weight for vet/new diversity
 
+    # CP-SAT solver parameters (None leaves the solver default)
+    time_limit: float = 300.0  # Wall-clock limit in seconds
+    num_workers: int = min(16, os.cpu_count() or 8)  # Parallel portfolio workers
+    random_seed: int | None = None
+    linearization_level: int | None = None  # 2 adds more LP relaxation
+    optimize_with_core: bool = False  # Core-based (lower bound) search
+    stop_after_first_solution: bool = False
+    log_search_progress: bool = True
+
     @classmethod
     def default(cls) -> 'Config':
         """Get default configuration."""
@@ -1,114 +1,102 @@
 from ortools.sat.python import cp_model
 from src.models import Youth, Center
-from typing import cast
 from src.config import Config
 
+# crew_vars[yi][ci][ki] is the BoolVar for youth yi in crew ki of center ci; center_vars[yi][ci] for the center.
+# Integer indices follow the order of youth_list, centers and center.crews.
+CrewVars = list[list[list[cp_model.IntVar]]]
+CenterVars = list[list[cp_model.IntVar]]
 
-def add_one_crew_per_youth(model: cp_model.CpModel, person_crew: dict, youth_list: list[Youth], centers: list[Center]):
+
+def add_one_crew_per_youth(model: cp_model.CpModel, crew_vars: CrewVars) -> None:
     """
     Ensures each youth is assigned to exactly one crew.
 
     This is a fundamental constraint that prevents a youth from being:
     - Unassigned (must be in at least one crew)
     - Double-assigned (cannot be in multiple crews)
+
+    crew_vars holds only the regular youth rows; young adult slots are constants (see get_fixed_crew_slots).
     """
-    for youth in youth_list:
-        if youth.role == 'Youth':
-            model.Add(
-                sum(person_crew[youth.name, center.name, crew.name] for center in centers for crew in center.crews) == 1
-            )
-        else:  # Young Adult
-            for center in centers:
-                for crew in center.crews:
-                    # If young adult is in this crew's adults list, force assignment
-                    if youth.name in crew.adults:
-                        model.Add(person_crew[youth.name, center.name, crew.name] == 1)
-                    else:
-                        model.Add(person_crew[youth.name, center.name, crew.name] == 0)
+    for youth_crews in crew_vars:
+        model.AddExactlyOne([var for center_crews in youth_crews for var in center_crews])
 
 
-def link_crew_and_center_vars(
-    model: cp_model.CpModel, person_crew: dict, person_center: dict, youth_list: list[Youth], centers: list[Center]
-):
+def link_crew_and_center_vars(model: cp_model.CpModel, crew_vars: CrewVars, center_vars: CenterVars) -> None:
     """
     Links the crew and center assignment variables.
 
     If a youth is assigned to a crew in a center, they must be marked as assigned to that center.
     This maintains consistency between crew and center assignments and simplifies other constraints.
     """
-    for youth in youth_list:
-        for center in centers:
-            model.Add(
-                person_center[youth.name, center.name]
-                == sum(person_crew[youth.name, center.name, crew.name] for crew in center.crews)
-            )
+    for youth_crews, youth_centers in zip(crew_vars, center_vars):
+        for center_crews, center_var in zip(youth_crews, youth_centers):
+            model.Add(center_var == cp_model.LinearExpr.Sum(center_crews))
 
 
 def enforce_parent_center_constraint(
     model: cp_model.CpModel,
-    person_crew: dict,
-    person_center: dict,
+    center_vars: CenterVars,
     youth_list: list[Youth],
-    centers: list[Center],
-):
+    adult_to_center: dict[str, int],
+) -> None:
     """
     Ensures youth are assigned to the same center as their parent(s), but not the same crew.
 
     This constraint:
     1. Forces youth to be in the same center as their parent(s)
-    2. Prevents youth from being in their parent's crew
-    3. Raises an error if a parent is not found in any center
-    4. Assumes all parents of the same child are at the same center (guaranteed by data)
-    """
-    # Pre-compute adult names and their center mappings for efficiency
-    adult_names = set()
-    adult_to_center = {}
-    for center in centers:
-        for crew in center.crews:
-            for adult in crew.adults:
-                adult_names.add(adult)
-                adult_to_center[adult] = center
-
-    for youth in youth_list:
+    2. Raises an error if a parent is not found in any center
+    3. Assumes all parents of the same child are at the same center (guaranteed by data)
+
+    Keeping youth out of their parent's crew is handled by get_fixed_crew_slots, which fixes those
+    slots to 0. adult_to_center maps every adult name to its center index and is built once by the
+    model builder.
+    """
+    for yi, youth in enumerate(youth_list):
         if youth.parent_names_list:
             # Check that all parents exist in adult crews
             for parent_name in youth.parent_names_list:
-                if parent_name not in adult_names:
+                if parent_name not in adult_to_center:
                     raise ValueError(f'Parent {parent_name} not found in any center for {youth.name}')
 
             # Find the center where parents are located (use pre-computed mapping)
-            parent_center = adult_to_center.get(youth.parent_names_list[0])
-
-            if parent_center:
-                # Youth must be assigned to the parent's center
-                model.Add(person_center[youth.name, parent_center.name] == 1)
+            parent_ci = adult_to_center[youth.parent_names_list[0]]
 
-                # Prevent youth from being in same crew as any parent
-                for crew in parent_center.crews:
-                    for parent_name in youth.parent_names_list:
-                        if parent_name in crew.adults:
-                            model.Add(person_crew[youth.name, parent_center.name, crew.name] == 0)
+            # Youth must be assigned to the parent's center
+            model.Add(center_vars[yi][parent_ci] == 1)
 
 
 def enforce_sibling_center_constraint(
-    model: cp_model.CpModel, person_center: dict, youth_list: list[Youth], centers: list[Center], youth_dict: dict
-):
+    model: cp_model.CpModel, center_vars: CenterVars, youth_list: list[Youth], youth_index: dict[str, int]
+) -> None:
     """
     Ensures siblings are assigned to the same center.
 
     This keeps families together at the same worksite while still allowing
     siblings to be in different crews within that center.
     """
-    for youth in youth_list:
+    for yi, youth in enumerate(youth_list):
         for sibling in youth.siblings_list:
-            if sibling in youth_dict:
-                for center in centers:
-                    model.Add(person_center[youth.name, center.name] == person_center[sibling, center.name])
+            if sibling in youth_index:
+                for youth_var, sibling_var in zip(center_vars[yi], center_vars[youth_index[sibling]]):
+                    model.Add(youth_var == sibling_var)
+
+
+def _add_crew_separation(model: cp_model.CpModel, crew_vars: CrewVars, yi: int, other: int) -> None:
+    """Post one "not both" clause per crew for a pair of youth.
+
+    The clauses are appended to the model proto directly (a negated literal is -index - 1), skipping the
+    per-call argument checks of AddBoolOr/Not in this pairs-by-crews loop.
+    """
+    constraints = model.Proto().constraints
+    for youth_crews, other_crews in zip(crew_vars[yi], crew_vars[other]):
+        for youth_var, other_var in zip(youth_crews, other_crews):
+            constraints.add().bool_or.literals.extend((-youth_var.Index() - 1, -other_var.Index() - 1))
 
 
 def enforce_sibling_crew_separation_constraint(
-    model: cp_model.CpModel, person_crew: dict, youth_list: list[Youth], centers: list[Center], youth_dict: dict
-):
+    model: cp_model.CpModel, crew_vars: CrewVars, youth_list: list[Youth], youth_index: dict[str, int]
+) -> set[tuple[int, int]]:
     """
     Prevents siblings from being assigned to the same crew.
 
@@ -116,61 +104,56 @@ def enforce_sibling_crew_separation_constraint(
     enforce_sibling_center_constraint), they are placed in different crews.
 
     Optimized to avoid duplicate constraints by only processing each sibling pair once.
+    Each pair is posted as one "not both" clause per crew, and the processed pairs are returned
+    so the friend separation constraint can skip siblings who also list each other as friends.
     """
-    processed_pairs = set()
+    processed_pairs: set[tuple[int, int]] = set()
 
-    for youth in youth_list:
+    for yi, youth in enumerate(youth_list):
         for sibling in youth.siblings_list:
-            if sibling in youth_dict:
+            if sibling in youth_index:
                 # Create a canonical pair representation to avoid duplicates
-                pair = tuple(sorted([youth.name, sibling]))
+                pair = (min(yi, youth_index[sibling]), max(yi, youth_index[sibling]))
                 if pair not in processed_pairs:
                     processed_pairs.add(pair)
+                    _add_crew_separation(model, crew_vars, yi, youth_index[sibling])
 
-                    for center in centers:
-                        for crew in center.crews:
-                            model.Add(
-                                person_crew[youth.name, center.name, crew.name]
-                                + person_crew[sibling, center.name, crew.name]
-                                <= 1
-                            )
+    return processed_pairs
 
 
 def enforce_friend_separation_constraint(
-    model: cp_model.CpModel, person_crew: dict, youth_list: list[Youth], centers: list[Center], youth_dict: dict
-):
+    model: cp_model.CpModel,
+    crew_vars: CrewVars,
+    youth_list: list[Youth],
+    youth_index: dict[str, int],
+    processed_pairs: set[tuple[int, int]] | None = None,
+) -> None:
     """
     Prevents friends from being assigned to the same crew.
 
     This encourages youth to meet new people and prevents cliques from forming.
     It applies to all friend choices (first, second, and third choices).
 
-    Optimized to avoid duplicate constraints by only processing each friend pair once.
+    Optimized to avoid duplicate constraints by only processing each friend pair once. Pairs already
+    separated elsewhere (e.g. by the sibling separation constraint) can be passed in as processed_pairs.
     """
-    processed_pairs = set()
+    processed_pairs = set(processed_pairs or ())
 
-    for youth in youth_list:
+    for yi, youth in enumerate(youth_list):
         choices = [youth.first_choice, youth.second_choice, youth.third_choice]
         choices = [c for c in choices if c is not None]
         for friend in choices:
-            if friend in youth_dict:
+            if friend in youth_index:
                 # Create a canonical pair representation to avoid duplicates
-                pair = tuple(sorted([youth.name, cast(str, friend)]))
+                pair = (min(yi, youth_index[friend]), max(yi, youth_index[friend]))
                 if pair not in processed_pairs:
                     processed_pairs.add(pair)
-
-                    for center in centers:
-                        for crew in center.crews:
-                            model.Add(
-                                person_crew[youth.name, center.name, crew.name]
-                                + person_crew[friend, center.name, crew.name]
-                                <= 1
-                            )
+                    _add_crew_separation(model, crew_vars, yi, youth_index[friend])
 
 
 def enforce_friend_center_constraint(
-    model: cp_model.CpModel, person_center: dict, youth_list: list[Youth], centers: list[Center], youth_dict: dict
-):
+    model: cp_model.CpModel, center_vars: CenterVars, youth_list: list[Youth], youth_index: dict[str, int]
+) -> None:
     """
     Ensures youth are assigned to centers with at least one of their friend choices.
 
@@ -178,22 +161,21 @@ def enforce_friend_center_constraint(
     friends can't be in the same crew, they will at least be at the same worksite
     and can interact during non-work times.
     """
-    for youth in youth_list:
+    for yi, youth in enumerate(youth_list):
         choices = [youth.first_choice, youth.second_choice, youth.third_choice]
-        valid_choices = [c for c in choices if c is not None and c in youth_dict]
+        valid_choices = [youth_index[c] for c in choices if c is not None and c in youth_index]
         if valid_choices:
-            for center in centers:
-                friend_vars = [person_center[friend, center.name] for friend in valid_choices]
-                model.Add(person_center[youth.name, center.name] <= sum(friend_vars))
+            for ci, center_var in enumerate(center_vars[yi]):
+                friend_vars = [center_vars[friend][ci] for friend in valid_choices]
+                model.Add(center_var <= cp_model.LinearExpr.Sum(friend_vars))
 
 
 def enforce_crew_size_constraints(
     model: cp_model.CpModel,
-    person_crew: dict,
-    youth_list: list[Youth],
+    crew_vars: CrewVars,
     centers: list[Center],
     config: Config,
-):
+) -> None:
     """
     Enforces minimum and maximum crew size constraints.
 
@@ -203,35 +185,114 @@ def enforce_crew_size_constraints(
     3. Counts both youth and existing adults in the size calculations
     4. Links crew assignments to center assignments for consistency
     """
-    for center in centers:
-        for crew in center.crews:
-            # Count regular youth in crew (youth_list is already filtered to regular youth)
-            youth_in_crew = sum(person_crew[youth.name, center.name, crew.name] for youth in youth_list)
+    min_crew_size, max_crew_size = config.min_crew_size, config.max_crew_size
+    for ci, center in enumerate(centers):
+        for ki, crew in enumerate(center.crews):
+            # Count regular youth in crew (crew_vars is already filtered to regular youth rows)
+            youth_in_crew = cp_model.LinearExpr.Sum([youth_crews[ci][ki] for youth_crews in crew_vars])
 
             # Count all adults (including young adults) in crew
             current_adult_count = len(crew.adults)
 
-            # Size constraints including adults
-            model.Add(youth_in_crew + current_adult_count >= config.min_crew_size)
-            model.Add(youth_in_crew + current_adult_count <= config.max_crew_size)
+            # Size constraints including adults, posted as one bounded linear constraint
+            model.AddLinearConstraint(
+                youth_in_crew, min_crew_size - current_adult_count, max_crew_size - current_adult_count
+            )
 
 
-def enforce_past_leader_constraint(
-    model: cp_model.CpModel,
-    person_crew: dict,
+def get_fixed_crew_slots(
     youth_list: list[Youth],
     centers: list[Center],
-):
+    adult_to_center: dict[str, int],
+    adult_to_crew: dict[str, int],
+) -> dict[tuple[int, int, int], int]:
     """
-    Prevents youth from being assigned to crews led by their past leaders.
+    Finds the (yi, ci, ki) crew slots whose value is already decided by the data.
 
-    This constraint ensures youth don't repeat experiences with the same adult leaders,
-    encouraging them to work with different adults each year.
+    These become constants at variable creation, so CP-SAT never sees them as decisions:
+    1. Young adults are fixed to 1 in the crew whose adults list has them, and 0 everywhere else
+    2. Youth are fixed to 0 in their parent's crew (in the parent's center)
+    3. Youth are fixed to 0 in crews led by their past leaders, so they work with different adults each year
     """
-    for youth in youth_list:
+    all_slots = [(ci, ki, crew) for ci, center in enumerate(centers) for ki, crew in enumerate(center.crews)]
+    fixed: dict[tuple[int, int, int], int] = {}
+    for yi, youth in enumerate(youth_list):
+        if youth.role != 'Youth':
+            for ci, ki, crew in all_slots:
+                fixed[yi, ci, ki] = int(youth.name in crew.adults_set)
+            continue
+
+        # Parents missing from every crew are reported by enforce_parent_center_constraint
+        parents = [parent_name for parent_name in youth.parent_names_list if parent_name in adult_to_center]
+        if parents and youth.parent_names_list[0] in adult_to_center:
+            parent_ci = adult_to_center[youth.parent_names_list[0]]
+            for parent_name in parents:
+                if adult_to_center[parent_name] == parent_ci:
+                    fixed[yi, parent_ci, adult_to_crew[parent_name]] = 0
+
         if youth.past_leaders:  # Only apply if youth has past leaders
-            for center in centers:
-                for crew in center.crews:
-                    # Check if any of youth's past leaders are in this crew
-                    if any(leader in crew.adults for leader in youth.past_leaders):
-                        model.Add(person_crew[youth.name, center.name, crew.name] == 0)
+            for ci, ki, crew in all_slots:
+                # Check if any of youth's past leaders are in this crew
+                if not crew.adults_set.isdisjoint(youth.past_leaders):
+                    fixed[yi, ci, ki] = 0
+    return fixed
+
+
+def get_interchangeable_crews(
+    youth_list: list[Youth],
+    centers: list[Center],
+    fixed_slots: dict[tuple[int, int, int], int],
+) -> list[tuple[int, list[int]]]:
+    """
+    Groups the crews of each center that the model cannot tell apart, as (ci, [ki, ...]) pairs.
+
+    Two crews are interchangeable when they have the same number of adults, none of them a young adult,
+    and no regular youth has a fixed slot in either (no parent or past leader there). Swapping the youth
+    of two such crews gives another solution with the same objective.
+    """
+    young_adults = {youth.name for youth in youth_list if youth.role != 'Youth'}
+    pinned_crews = {(ci, ki) for (yi, ci, ki) in fixed_slots if youth_list[yi].role == 'Youth'}
+    crew_classes: list[tuple[int, list[int]]] = []
+    for ci, center in enumerate(centers):
+        by_adult_count: dict[int, list[int]] = {}
+        for ki, crew in enumerate(center.crews):
+            if (ci, ki) not in pinned_crews and crew.adults_set.isdisjoint(young_adults):
+                by_adult_count.setdefault(len(crew.adults), []).append(ki)
+        crew_classes.extend((ci, crew_class) for crew_class in by_adult_count.values() if len(crew_class) > 1)
+    return crew_classes
+
+
+def enforce_crew_symmetry_breaking(
+    model: cp_model.CpModel, crew_vars: CrewVars, crew_classes: list[tuple[int, list[int]]]
+) -> None:
+    """
+    Breaks the symmetry between interchangeable crews (see get_interchangeable_crews).
+
+    Within each class, a youth may only be in a crew if some earlier youth (in youth list order) is in
+    the crew before it. Every solution can be relabeled to satisfy this, so no objective value is lost,
+    but the solver no longer explores each permutation of the same crews.
+
+    "Some earlier youth is in the crew before it" is carried as a prefix chain, one aux bool per youth:
+    seen_j <=> seen_{j-1} or youth j is in prev_ki, and youth j in ki implies seen_{j-1}. This keeps each
+    pair of crews to O(youth) literals instead of one growing clause per youth.
+
+    crew_vars holds only the regular youth rows.
+    """
+    for ci, crew_class in crew_classes:
+        for prev_ki, ki in zip(crew_class, crew_class[1:]):
+            seen: cp_model.IntVar | None = None  # no youth seen yet
+            for yi, youth_crews in enumerate(crew_vars):
+                in_crew, in_prev = youth_crews[ci][ki], youth_crews[ci][prev_ki]
+                if seen is None:
+                    # Nobody precedes the first youth, so they cannot open the later crew
+                    model.AddBoolOr([in_crew.Not()])
+                    seen = in_prev
+                    continue
+                model.AddImplication(in_crew, seen)
+                if yi == len(crew_vars) - 1:
+                    break
+                next_seen = model.NewBoolVar(f'crew_{ci}_{prev_ki}_seen_by_{yi}')
+                model.AddBoolOr([next_seen.Not(), seen, in_prev])
+                model.AddImplication(seen, next_seen)
+                model.AddImplication(in_prev, next_seen)
+                seen = next_seen
@@ -1,7 +1,15 @@
 from ortools.sat.python import cp_model
 from src.models import Center, Youth
 from src.config import Config
+import numpy as np
+from importlib.metadata import version
+import contextlib
+import os
+import pickle
+import tempfile
 from src.linear_program.constraints import (
+    CenterVars,
+    CrewVars,
     add_one_crew_per_youth,
     link_crew_and_center_vars,
     enforce_parent_center_constraint,
@@ -10,65 +18,215 @@ from src.linear_program.constraints import (
     enforce_friend_separation_constraint,
     enforce_friend_center_constraint,
     enforce_crew_size_constraints,
-    enforce_past_leader_constraint,
+    enforce_crew_symmetry_breaking,
+    get_fixed_crew_slots,
+    get_interchangeable_crews,
 )
 from src.linear_program.objectives import (
+    CrewArrays,
+    ObjectiveTerms,
+    add_crew_diversity_objectives,
     add_friend_preference_objectives,
-    add_gender_diversity_objectives,
-    add_year_diversity_objectives,
-    add_history_diversity_objectives,
 )
 
+# Name-keyed views of the model variables: (youth, center) and (youth, center, crew)
+PersonCenter = dict[tuple[str, str], cp_model.IntVar]
+PersonCrew = dict[tuple[str, str, str], cp_model.IntVar]
+
+# Config fields that shape the model (the solver parameters do not), and the modules that build it
+MODEL_CONFIG_FIELDS = (
+    'min_crew_size',
+    'max_crew_size',
+    'friend_weight',
+    'gender_weight',
+    'year_weight',
+    'history_weight',
+)
+_BUILDER_MODULES = [
+    os.path.join(os.path.dirname(__file__), module) for module in ('lp_model.py', 'constraints.py', 'objectives.py')
+] + [os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models.py')]  # siblings_list, adults_set, ...
+
 
 def create_crew_assignment_model(
     cfg: Config, youth_list: list[Youth], centers: list[Center]
-) -> tuple[cp_model.CpModel, dict, dict]:
+) -> tuple[cp_model.CpModel, PersonCenter, PersonCrew]:
     print(f'Youth count: {len(youth_list)}')
     print(f'Centers: {[c.name for c in centers]}')
     print(f'Total crews: {sum(len(c.crews) for c in centers)}')
 
     model = cp_model.CpModel()
 
+    # Center and crew index of every adult (young adults included), built once for all lookups below
+    adult_to_center = {adult: ci for ci, center in enumerate(centers) for crew in center.crews for adult in crew.adults}
+    adult_to_crew = {adult: ki for center in centers for ki, crew in enumerate(center.crews) for adult in crew.adults}
+    # Every center an adult appears in; an adult listed at several centers counts at each of them
+    adult_centers: dict[str, list[int]] = {}
+    for ci, center in enumerate(centers):
+        for crew in center.crews:
+            for adult in crew.adults:
+                centers_of_adult = adult_centers.setdefault(adult, [])
+                if ci not in centers_of_adult:
+                    centers_of_adult.append(ci)
+
     # Create variables
-    # person_center[i, c] = 1 if person i is assigned to center c
-    person_center = {
-        (youth.name, center.name): model.NewBoolVar(f'person_{youth.name}_center_{center.name}')
+    # center_vars[yi][ci] = 1 if person yi is assigned to center ci. A young adult's center is fixed by the
+    # crew they lead, so theirs are constants rather than decisions
+    center_vars: CenterVars = [
+        [
+            model.NewConstant(int(ci in adult_centers.get(youth.name, ())))
+            if youth.role != 'Youth'
+            else model.NewBoolVar(f'person_{youth.name}_center_{center.name}')
+            for ci, center in enumerate(centers)
+        ]
         for youth in youth_list
-        for center in centers
-    }
+    ]
+
+    # Crew slots already decided by the data (young adults, parent crews, past leaders) become constants
+    fixed_slots = get_fixed_crew_slots(youth_list, centers, adult_to_center, adult_to_crew)
 
     # Create crew variables for each center
-    # person_crew[i, c, k] = 1 if person i is assigned to crew k in center c
-    person_crew = {}
-    for center in centers:
-        for crew in center.crews:
-            for youth in youth_list:
-                person_crew[(youth.name, center.name, crew.name)] = model.NewBoolVar(
-                    f'person_{youth.name}_center_{center.name}_crew_{crew.name}'
-                )
+    # crew_arrays[ci][yi, ki] = 1 if person yi is assigned to crew ki in center ci; variables are created crew by crew
+    crew_arrays: CrewArrays = []
+    for ci, center in enumerate(centers):
+        center_array = np.empty((len(youth_list), len(center.crews)), dtype=object)
+        for ki, crew in enumerate(center.crews):
+            for yi, youth in enumerate(youth_list):
+                fixed_value = fixed_slots.get((yi, ci, ki))
+                if fixed_value is not None:
+                    center_array[yi, ki] = model.NewConstant(fixed_value)
+                else:
+                    center_array[yi, ki] = model.NewBoolVar(
+                        f'person_{youth.name}_center_{center.name}_crew_{crew.name}'
+                    )
+        crew_arrays.append(center_array)
+    # Nested-list view, crew_vars[yi][ci][ki], for the constraints that walk one youth's row at a time
+    crew_vars: CrewVars = [[center_array[yi].tolist() for center_array in crew_arrays] for yi in range(len(youth_list))]
+
+    # Name-keyed views of the same variables for the objectives and for callers reading the solution
+    person_center: PersonCenter = {
+        (youth.name, center.name): center_vars[yi][ci]
+        for yi, youth in enumerate(youth_list)
+        for ci, center in enumerate(centers)
+    }
+    person_crew: PersonCrew = {
+        (youth.name, center.name, crew.name): crew_vars[yi][ci][ki]
+        for yi, youth in enumerate(youth_list)
+        for ci, center in enumerate(centers)
+        for ki, crew in enumerate(center.crews)
+    }
 
-    # Pre-compute youth dictionary and filter by role for efficiency
-    youth_dict = {youth.name: youth for youth in youth_list}
-    regular_youth = [youth for youth in youth_list if youth.role == 'Youth']
+    # Pre-compute youth lookups and filter by role for efficiency
+    youth_index = {youth.name: yi for yi, youth in enumerate(youth_list)}
+    # Partition youth once; young adult rows are all constants and need no assignment or link constraint
+    regular_idx = [yi for yi, youth in enumerate(youth_list) if youth.role == 'Youth']
+    regular_youth = [youth_list[yi] for yi in regular_idx]
+    regular_crew_vars = [crew_vars[yi] for yi in regular_idx]
+    regular_center_vars = [center_vars[yi] for yi in regular_idx]
 
     # Add constraints
-    add_one_crew_per_youth(model, person_crew, youth_list, centers)
-    link_crew_and_center_vars(model, person_crew, person_center, youth_list, centers)
-    enforce_parent_center_constraint(model, person_crew, person_center, youth_list, centers)
-    enforce_sibling_center_constraint(model, person_center, youth_list, centers, youth_dict)
-    enforce_sibling_crew_separation_constraint(model, person_crew, youth_list, centers, youth_dict)
-    enforce_friend_separation_constraint(model, person_crew, youth_list, centers, youth_dict)
-    enforce_friend_center_constraint(model, person_center, youth_list, centers, youth_dict)
-    enforce_crew_size_constraints(model, person_crew, regular_youth, centers, cfg)
-    enforce_past_leader_constraint(model, person_crew, youth_list, centers)
+    add_one_crew_per_youth(model, regular_crew_vars)
+    link_crew_and_center_vars(model, regular_crew_vars, regular_center_vars)
+    enforce_parent_center_constraint(model, center_vars, youth_list, adult_to_center)
+    enforce_sibling_center_constraint(model, center_vars, youth_list, youth_index)
+    separated_pairs = enforce_sibling_crew_separation_constraint(model, crew_vars, youth_list, youth_index)
+    enforce_friend_separation_constraint(model, crew_vars, youth_list, youth_index, separated_pairs)
+    enforce_friend_center_constraint(model, center_vars, youth_list, youth_index)
+    enforce_crew_size_constraints(model, regular_crew_vars, centers, cfg)
+    enforce_crew_symmetry_breaking(
+        model, regular_crew_vars, get_interchangeable_crews(youth_list, centers, fixed_slots)
+    )
+
+    # Regular youth rows of each center's crew array, so the diversity objectives can slice them by bucket index
+    regular_crew_arrays = [center_array[regular_idx] for center_array in crew_arrays]
 
     # Combine all objective terms
-    objective_terms = []
-    objective_terms.extend(add_friend_preference_objectives(model, person_center, youth_list, centers, cfg, youth_dict))
-    objective_terms.extend(add_gender_diversity_objectives(model, person_crew, regular_youth, centers, cfg))
-    objective_terms.extend(add_year_diversity_objectives(model, person_crew, regular_youth, centers, cfg))
-    objective_terms.extend(add_history_diversity_objectives(model, person_crew, regular_youth, centers, cfg))
+    objective_terms: ObjectiveTerms = []
+    objective_terms.extend(
+        add_friend_preference_objectives(model, center_vars, youth_list, centers, cfg, youth_index, adult_centers)
+    )
+    objective_terms.extend(add_crew_diversity_objectives(model, regular_crew_arrays, regular_youth, centers, cfg))
+
+    # One weighted sum over all (var, weight) pairs instead of folding per-term products
+    model.Maximize(
+        cp_model.LinearExpr.WeightedSum([var for var, _ in objective_terms], [weight for _, weight in objective_terms])
+    )
+
+    return model, person_center, person_crew
+
 
-    model.Maximize(sum(objective_terms))
+def configure_solver(solver: cp_model.CpSolver, cfg: Config) -> cp_model.CpSolver:
+    """Apply the solver parameters from cfg, leaving the CP-SAT default for any that are None."""
+    solver.parameters.max_time_in_seconds = cfg.time_limit
+    solver.parameters.num_search_workers = cfg.num_workers
+    solver.parameters.stop_after_first_solution = cfg.stop_after_first_solution
+    solver.parameters.log_search_progress = cfg.log_search_progress
+    solver.parameters.optimize_with_core = cfg.optimize_with_core
+    if cfg.random_seed is not None:
+        solver.parameters.random_seed = cfg.random_seed
+    if cfg.linearization_level is not None:
+        solver.parameters.linearization_level = cfg.linearization_level
+    return solver
 
+
+def load_or_create_crew_assignment_model(
+    cfg: Config,
+    youth_list: list[Youth],
+    centers: list[Center],
+    cache_dir: str = './data/cache',
+    use_cache: bool = True,
+) -> tuple[cp_model.CpModel, PersonCenter, PersonCrew]:
+    """Reuse a pickled snapshot of the built model when its inputs are unchanged.
+
+    A single snapshot file holds the CpModelProto bytes, the proto index of every person_center/person_crew
+    variable and the key it was built for: the youth, the centers, the model fields of cfg and the OR-Tools
+    version. It is used only when the key matches and it is newer than every builder module (models.py
+    included, since the model reads its parsed fields); otherwise the model is rebuilt and the snapshot
+    overwritten, so the cache never holds more than one file. A snapshot that cannot be read is treated as
+    a miss. Writing it is best-effort and atomic (temp file, then os.replace), so an interrupted run never
+    leaves a truncated snapshot behind. With use_cache=False the snapshot is deleted and neither read nor
+    written.
+    """
+    cache_path = os.path.join(cache_dir, 'crew_model.pkl')
+    if not use_cache:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(cache_path)
+        return create_crew_assignment_model(cfg, youth_list, centers)
+
+    key = repr((youth_list, centers, [getattr(cfg, name) for name in MODEL_CONFIG_FIELDS], version('ortools')))
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= max(map(os.path.getmtime, _BUILDER_MODULES)):
+        try:
+            with open(cache_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot['key'] == key:
+                model = cp_model.CpModel()
+                model.Proto().ParseFromString(snapshot['proto'])
+                person_center = {
+                    name: model.GetIntVarFromProtoIndex(i) for name, i in snapshot['person_center'].items()
+                }
+                person_crew = {name: model.GetIntVarFromProtoIndex(i) for name, i in snapshot['person_crew'].items()}
+                print(f'Loaded model from {cache_path}')
+                return model, person_center, person_crew
+        except Exception:
+            # A truncated or otherwise unreadable snapshot is a cache miss; it is rebuilt and overwritten below
+            pass
+
+    model, person_center, person_crew = create_crew_assignment_model(cfg, youth_list, centers)
+    snapshot = {
+        'key': key,
+        'proto': model.Proto().SerializeToString(),
+        'person_center': {name: var.Index() for name, var in person_center.items()},
+        'person_crew': {name: var.Index() for name, var in person_crew.items()},
+    }
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(snapshot, f)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+    except OSError:
+        pass
     return model, person_center, person_crew
@@ -1,16 +1,24 @@
 from ortools.sat.python import cp_model
 from src.models import Youth, Center
 from src.config import Config
+from src.linear_program.constraints import CenterVars
+import numpy as np
+
+# crew_arrays[ci] is a (youth, crew) object array of the center ci crew vars, rows in youth_list order
+CrewArrays = list[np.ndarray]
+# Objective contributions as (var, integer weight) pairs, summed once with LinearExpr.WeightedSum
+ObjectiveTerms = list[tuple[cp_model.IntVar, int]]
 
 
 def add_friend_preference_objectives(
     model: cp_model.CpModel,
-    person_center: dict,
+    center_vars: CenterVars,
     youth_list: list[Youth],
     centers: list[Center],
     cfg: Config,
-    youth_dict: dict,
-) -> list:
+    youth_index: dict[str, int],
+    adult_centers: dict[str, list[int]],
+) -> ObjectiveTerms:
     """
     Rewards youth being in the same center as their friend choices.
     Young adults' friend preferences are considered but their assignments are fixed.
@@ -20,10 +28,13 @@ def add_friend_preference_objectives(
     - Second choice: 2 points
     - Third choice: 1 point
 
-    Each point is multiplied by the friend_weight from config.
+    Each point is multiplied by the friend_weight from config. adult_centers maps every adult
+    (young adults included) to each center index it appears in and is built once by the model builder.
     """
-    objective_terms = []
-    for youth in youth_list:
+    # Reward weights on the raw center vars (young adult side is fixed) and on shared same-center pairs
+    center_weights: dict[tuple[int, int], int] = {}
+    pair_weights: dict[tuple[int, int, int], int] = {}
+    for yi, youth in enumerate(youth_list):
         # Include friend preferences for both youth and young adults
         friend_choices = {
             youth.first_choice: 3,
@@ -31,120 +42,98 @@ def add_friend_preference_objectives(
             youth.third_choice: 1,
         }
         for friend, weight in friend_choices.items():
-            if friend is not None and friend in youth_dict:
-                for center in centers:
-                    # For young adults, their center assignment is fixed but still contributes to objective
-                    if youth.role == 'Young Adult':
-                        # Only add objective term if young adult is actually in this center
-                        is_ya_in_center = any(youth.name in crew.adults for crew in center.crews)
-                        if is_ya_in_center:
-                            objective_terms.append(cfg.friend_weight * weight * person_center[friend, center.name])
-                    else:
-                        # Simplified: reward when both youth and friend are in the same center
-                        # This is equivalent to the multiplication but more efficient
-                        same_center = model.NewBoolVar(f'same_center_{youth.name}_{friend}_{center.name}')
-                        model.Add(same_center <= person_center[youth.name, center.name])
-                        model.Add(same_center <= person_center[friend, center.name])
-                        model.Add(
-                            same_center
-                            >= person_center[youth.name, center.name] + person_center[friend, center.name] - 1
-                        )
-                        objective_terms.append(cfg.friend_weight * weight * same_center)
+            if friend is not None and friend in youth_index:
+                fi = youth_index[friend]
+                if youth.role == 'Young Adult':
+                    # A young adult's center is fixed, so the friend just needs to be in one of those centers
+                    for ci in adult_centers.get(youth.name, []):
+                        center_weights[fi, ci] = center_weights.get((fi, ci), 0) + weight
+                elif youth_list[fi].role == 'Young Adult':
+                    # Same reasoning from the other side: reward the youth being in the young adult's center
+                    for ci in adult_centers.get(friend, []):
+                        center_weights[yi, ci] = center_weights.get((yi, ci), 0) + weight
+                else:
+                    # One same-center var per unordered pair and center, shared when both chose each other
+                    first, second = sorted((yi, fi), key=lambda i: youth_list[i].name)
+                    for ci in range(len(centers)):
+                        key = (first, second, ci)
+                        pair_weights[key] = pair_weights.get(key, 0) + weight
+
+    objective_terms: ObjectiveTerms = []
+    for (yi, ci), weight in center_weights.items():
+        objective_terms.append((center_vars[yi][ci], cfg.friend_weight * weight))
+    # The same-center linearization is the bulk of the model, so its rows go straight into the proto
+    constraints = model.Proto().constraints
+    for (first, second, ci), weight in pair_weights.items():
+        # Reward when both youth and friend are in the same center
+        first_index, second_index = center_vars[first][ci].Index(), center_vars[second][ci].Index()
+        same_center = model.NewBoolVar(
+            f'same_center_{youth_list[first].name}_{youth_list[second].name}_{centers[ci].name}'
+        )
+        same_index = same_center.Index()
+        # same_center <= first, same_center <= second, same_center >= first + second - 1
+        for indices, coeffs, domain in (
+            ((first_index, same_index), (-1, 1), (cp_model.INT_MIN, 0)),
+            ((second_index, same_index), (-1, 1), (cp_model.INT_MIN, 0)),
+            ((second_index, first_index, same_index), (-1, -1, 1), (-1, cp_model.INT_MAX)),
+        ):
+            linear = constraints.add().linear
+            linear.vars.extend(indices)
+            linear.coeffs.extend(coeffs)
+            linear.domain.extend(domain)
+        objective_terms.append((same_center, cfg.friend_weight * weight))
 
     return objective_terms
 
 
-def add_gender_diversity_objectives(
+def add_crew_diversity_objectives(
     model: cp_model.CpModel,
-    person_crew: dict,
+    crew_arrays: CrewArrays,
     youth_list: list[Youth],
     centers: list[Center],
     cfg: Config,
-) -> list:
+) -> ObjectiveTerms:
     """
-    Rewards crews that have a good balance of male and female youth.
-
-    Creates a gender_balance variable for each crew that represents the
-    minimum of males and females in that crew. This encourages having
-    similar numbers of each gender.
+    Rewards diverse crews, walking each crew once for all three diversity measures.
+
+    For every crew:
+    - Gender: a gender_balance variable equal to the minimum of males and females (AddMinEquality),
+      encouraging similar numbers of each gender
+    - Year: a point for each year (Fr/So/Jr/Sr) represented in the crew, encouraging a mix of ages
+    - History: a history_balance variable equal to the minimum of veterans and new participants
+      (AddMinEquality), encouraging a balanced mix of experience levels
     """
-    objective_terms = []
-
-    for center in centers:
-        for crew in center.crews:
-            females_in_crew = sum(
-                person_crew[youth.name, center.name, crew.name] for youth in youth_list if youth.gender == 'F'
-            )
-            males_in_crew = sum(
-                person_crew[youth.name, center.name, crew.name] for youth in youth_list if youth.gender == 'M'
-            )
-
-            gender_balance = model.NewIntVar(0, cfg.max_crew_size, f'gender_balance_{center.name}_{crew.name}')
-            model.Add(gender_balance <= females_in_crew)
-            model.Add(gender_balance <= males_in_crew)
-            objective_terms.append(cfg.gender_weight * gender_balance)
-
-    return objective_terms
-
-
-def add_year_diversity_objectives(
-    model: cp_model.CpModel,
-    person_crew: dict,
-    youth_list: list[Youth],
-    centers: list[Center],
-    cfg: Config,
-) -> list:
-    """
-    Rewards crews that have youth from multiple grade levels.
-
-    Adds a point for each year (Fr/So/Jr/Sr) that is represented in the crew,
-    encouraging a mix of ages rather than grouping by grade level.
-    """
-    objective_terms = []
+    objective_terms: ObjectiveTerms = []
     years = ['Fr', 'So', 'Jr', 'Sr']
+    # Bucket youth by each attribute once, as row index arrays into each crew's column of vars
+    female_idx = np.flatnonzero([youth.gender == 'F' for youth in youth_list])
+    male_idx = np.flatnonzero([youth.gender == 'M' for youth in youth_list])
+    vet_idx = np.flatnonzero([youth.history == 'V' for youth in youth_list])
+    new_idx = np.flatnonzero([youth.history == 'N' for youth in youth_list])
+    # A year nobody is in can never be represented, so it needs no variable at all
+    by_year = {year: np.flatnonzero([youth.year == year for youth in youth_list]) for year in years}
+    by_year = {year: idx for year, idx in by_year.items() if len(idx)}
+
+    for ci, center in enumerate(centers):
+        for ki, crew in enumerate(center.crews):
+            crew_column = crew_arrays[ci][:, ki]
+
+            females_in_crew = cp_model.LinearExpr.Sum(crew_column[female_idx].tolist())
+            males_in_crew = cp_model.LinearExpr.Sum(crew_column[male_idx].tolist())
+            gender_balance = model.NewIntVar(0, cfg.max_crew_size, f'gender_balance_{center.name}_{crew.name}')
+            model.AddMinEquality(gender_balance, [females_in_crew, males_in_crew])
+            objective_terms.append((gender_balance, cfg.gender_weight))
 
-    for center in centers:
-        for crew in center.crews:
-            for year in years:
-                year_count = sum(
-                    person_crew[youth.name, center.name, crew.name] for youth in youth_list if youth.year == year
-                )
+            for year, year_idx in by_year.items():
+                # has_year is the Boolean max (OR) of the year's crew slots
                 has_year = model.NewBoolVar(f'has_year_{center.name}_{crew.name}_{year}')
-                model.Add(year_count >= 1).OnlyEnforceIf(has_year)
-                model.Add(year_count == 0).OnlyEnforceIf(has_year.Not())
-                objective_terms.append(cfg.year_weight * has_year)
-
-    return objective_terms
-
-
-def add_history_diversity_objectives(
-    model: cp_model.CpModel,
-    person_crew: dict,
-    youth_list: list[Youth],
-    centers: list[Center],
-    cfg: Config,
-) -> list:
-    """
-    Rewards crews that have a mix of veterans and new participants.
-
-    Creates a history_balance variable for each crew that represents the
-    minimum of veterans and new participants, encouraging a balanced mix
-    of experience levels.
-    """
-    objective_terms = []
-
-    for center in centers:
-        for crew in center.crews:
-            vets_in_crew = sum(
-                person_crew[youth.name, center.name, crew.name] for youth in youth_list if youth.history == 'V'
-            )
-            new_in_crew = sum(
-                person_crew[youth.name, center.name, crew.name] for youth in youth_list if youth.history == 'N'
-            )
+                model.AddMaxEquality(has_year, crew_column[year_idx].tolist())
+                objective_terms.append((has_year, cfg.year_weight))
 
+            vets_in_crew = cp_model.LinearExpr.Sum(crew_column[vet_idx].tolist())
+            new_in_crew = cp_model.LinearExpr.Sum(crew_column[new_idx].tolist())
             history_balance = model.NewIntVar(0, cfg.max_crew_size, f'history_balance_{center.name}_{crew.name}')
-            model.Add(history_balance <= vets_in_crew)
-            model.Add(history_balance <= new_in_crew)
-            objective_terms.append(cfg.history_weight * history_balance)
+            model.AddMinEquality(history_balance, [vets_in_crew, new_in_crew])
+            objective_terms.append((history_balance, cfg.history_weight))
 
     return objective_terms
@@ -1,73 +1,115 @@
-from pydantic import BaseModel, Field
-from functools import cached_property
+from dataclasses import dataclass, field
+import numpy as np
 
+# Attribute values in code order; a youth's code is the index of its value
+YEARS = ('Fr', 'So', 'Jr', 'Sr')
+GENDERS = ('M', 'F')
+HISTORIES = ('V', 'N')
 
-class Crew(BaseModel):
+
+@dataclass(slots=True)
+class Crew:
     name: str
-    size: int = Field(default=0)
-    members: list[str] = Field(default_factory=list)
     adults: list[str]
+    members: list[str] = field(init=False)
+    adults_set: frozenset[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.members = list(self.adults)
+        self.adults_set = frozenset(self.adults)
 
-    def __init__(self, name: str, adults: list[str]):
-        super().__init__(name=name, adults=adults, members=adults)
-        self.recompute_size()
+    @property
+    def size(self) -> int:
+        return len(self.members)
 
     def add_member(self, member: str):
         self.members.append(member)
-        self.recompute_size()
-
-    def recompute_size(self):
-        self.size = len(self.members)
 
 
-class Center(BaseModel):
+@dataclass(slots=True)
+class Center:
     name: str
     crews: list[Crew]
-    crew_count: int = Field(default=0)
 
-    def __init__(self, name: str, crews: list[Crew]):
-        super().__init__(name=name, crews=crews)
-        self.crew_count = len(crews)
+    @property
+    def crew_count(self) -> int:
+        return len(self.crews)
 
     def add_crew(self, crew: Crew):
         self.crews.append(crew)
-        self.crew_count += 1
 
     def remove_crew(self, crew: Crew):
         self.crews.remove(crew)
-        self.crew_count -= 1
 
 
-class Person(BaseModel):
+@dataclass(slots=True)
+class Person:
     name: str
-    center: str | None = None
-    crew: str | None = None
+    # Keyword-only so subclasses can add required fields right after name and be built positionally
+    center: str | None = field(default=None, kw_only=True)
+    crew: str | None = field(default=None, kw_only=True)
 
 
+@dataclass(slots=True)
 class Youth(Person):
     year: str
     gender: str
     history: str
     parent_name: str | None = None
-    siblings: str | None = None
+    siblings: list[str] = field(default_factory=list)
     first_choice: str | None = None
     second_choice: str | None = None
     third_choice: str | None = None
-    past_leaders: list[str] = Field(default_factory=list)
     role: str = 'Youth'  # Can be "Youth" or "Young Adult"
+    # Attached after loading from the historical crews, never read from the buddy form
+    past_leaders: list[str] = field(default_factory=list, kw_only=True)
 
-    @cached_property
-    def siblings_list(self) -> list[str]:
-        if not self.siblings:
-            return []
-        return self.siblings.split('|')
+    # Siblings already arrive as a list; parents are split once here so the constraint loops read plain attributes
+    siblings_list: list[str] = field(init=False, repr=False, compare=False)
+    parent_names_list: tuple[str, ...] = field(init=False, repr=False, compare=False)
 
-    @cached_property
-    def parent_names_list(self) -> list[str]:
-        if not self.parent_name:
-            return []
-        return self.parent_name.split('|')
+    def __post_init__(self):
+        self.siblings_list = self.siblings
+        self.parent_names_list = tuple(self.parent_name.split('|')) if self.parent_name else ()
 
 
+@dataclass(slots=True)
 class Adult(Person):
     children: list[Youth]
+
+
+@dataclass
+class YouthTable:
+    """Struct-of-arrays view of a youth list for the analysis loops.
+
+    Friend choices are stored as indices into the youth list (-1 when missing or unknown) and
+    year/gender/history as integer codes into YEARS/GENDERS/HISTORIES.
+    """
+
+    names: list[str]
+    first_idx: np.ndarray
+    second_idx: np.ndarray
+    third_idx: np.ndarray
+    year_code: np.ndarray
+    gender_code: np.ndarray
+    history_code: np.ndarray
+
+    @classmethod
+    def from_youth_list(cls, youth_list: list[Youth]) -> 'YouthTable':
+        name_to_idx = {youth.name: i for i, youth in enumerate(youth_list)}
+
+        def index_of(name: str | None) -> int:
+            return name_to_idx.get(name, -1) if name else -1
+
+        year_codes = {year: i for i, year in enumerate(YEARS)}
+        gender_codes = {gender: i for i, gender in enumerate(GENDERS)}
+        history_codes = {history: i for i, history in enumerate(HISTORIES)}
+        return cls(
+            names=[youth.name for youth in youth_list],
+            first_idx=np.array([index_of(y.first_choice) for y in youth_list], dtype=np.int32),
+            second_idx=np.array([index_of(y.second_choice) for y in youth_list], dtype=np.int32),
+            third_idx=np.array([index_of(y.third_choice) for y in youth_list], dtype=np.int32),
+            year_code=np.array([year_codes[y.year] for y in youth_list], dtype=np.int8),
+            gender_code=np.array([gender_codes[y.gender] for y in youth_list], dtype=np.int8),
+            history_code=np.array([history_codes[y.history] for y in youth_list], dtype=np.int8),
+        )
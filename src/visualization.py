@@ -1,5 +1,6 @@
 import networkx as nx  # type: ignore
 import matplotlib.pyplot as plt
+from matplotlib.lines import Line2D
 from src.models import Center, Youth
 from community import community_louvain  # type: ignore
 import numpy as np
@@ -12,6 +13,7 @@ def create_friend_network_visualization(
     solver: cp_model.CpSolver,
     centers: list[Center],
     output_path: str = 'friend_network.png',
+    seed: int | None = 0,
 ):
     """
     Creates a visualization showing community groupings within each center.
@@ -24,25 +26,34 @@ def create_friend_network_visualization(
         solver: Solved CP model
         centers: List of Center objects
         output_path: Where to save the visualization
+        seed: Seed for community detection and the point jitter, so the same assignments give the same
+            image (None for a random one)
     """
+    rng = np.random.default_rng(seed)
+
     # Create network graph for community detection
     G = nx.Graph()
     center_names = [center.name for center in centers]
 
+    # Read each youth's assigned center from the solver once; both the graph and the per-center plots use it
+    youth_to_center: dict[str, str] = {}
     for youth in youth_list:
-        # Find which center this youth is assigned to
         for center_name in center_names:
             if solver.Value(person_center[youth.name, center_name]) == 1:
-                G.add_node(youth.name, center=center_name)
+                youth_to_center[youth.name] = center_name
                 break
 
+    for youth in youth_list:
+        if youth.name in youth_to_center:
+            G.add_node(youth.name, center=youth_to_center[youth.name])
+
         friend_weights = {youth.first_choice: 3, youth.second_choice: 2, youth.third_choice: 1}
         for friend, weight in friend_weights.items():
             if friend:
                 G.add_edge(youth.name, friend, weight=weight)
 
-    # Detect communities
-    communities = community_louvain.best_partition(G)
+    # Detect communities; Louvain visits nodes in random order, so it takes the same seed
+    communities = community_louvain.best_partition(G, random_state=seed)
     num_communities = max(communities.values()) + 1
 
     # Set up colors
@@ -60,12 +71,13 @@ def create_friend_network_visualization(
     available_height = 1 - 2 * vertical_padding
 
     # Group youth by center and community
+    center_communities: dict[str, list[int]] = {}
     for center_name, ax in center_axes.items():
-        # Get youth in this center using solver results
+        # Get youth in this center using the cached solver results
         center_youth = [
             (youth.name, communities[youth.name])
             for youth in youth_list
-            if solver.Value(person_center[youth.name, center_name]) == 1
+            if youth_to_center.get(youth.name) == center_name
         ]
 
         # Group by community
@@ -78,41 +90,32 @@ def create_friend_network_visualization(
         # Sort communities by size (optional)
         sorted_communities = sorted(community_groups.items(), key=lambda x: len(x[1]), reverse=True)
 
-        # Calculate positions for each community
+        # Lay out every youth of the center at once: one row per community, spread evenly across it
+        max_spread = 0.4  # Maximum horizontal spread from center
         spacing = available_height / max(len(sorted_communities), 1)
-
-        # Plot each community group
-        for i, (comm_id, members) in enumerate(sorted_communities):
-            num_members = len(members)
-            if num_members > 0:
-                # Calculate vertical position for this community
-                y_pos = 1 - vertical_padding - (i * spacing)
-
-                # Calculate horizontal positions
-                max_spread = 0.4  # Maximum horizontal spread from center
-                x_positions = np.linspace(-max_spread, max_spread, num_members) if num_members > 1 else np.array([0.0])
-
-                # Add small random jitter to prevent perfect alignment
-                x_jitter = np.random.normal(0, 0.02, num_members)
-                y_jitter = np.random.normal(0, 0.01, num_members)
-
-                # Create position arrays
-                x = np.full(num_members, 0.5) + x_positions + x_jitter
-                y = np.full(num_members, y_pos) + y_jitter
-
-                # Plot points
-                ax.scatter(x, y, color=community_colors[comm_id], s=100, alpha=0.6, label=f'Community {comm_id + 1}')
-
-                # Add labels
-                for j, name in enumerate(members):
-                    ax.annotate(
-                        name.split()[0],  # First name only
-                        (x[j], y[j]),
-                        xytext=(5, 5),
-                        textcoords='offset points',
-                        fontsize=8,
-                        alpha=0.7,
-                    )
+        sizes = np.array([len(members) for _, members in sorted_communities], dtype=np.int64)
+        names = [name for _, members in sorted_communities for name in members]
+        comm_ids = np.repeat([comm_id for comm_id, _ in sorted_communities], sizes).astype(np.int64)
+        rows = np.repeat(np.arange(len(sizes)), sizes)
+        member_sizes = sizes[rows]
+        member_pos = np.arange(len(names)) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        x_positions = np.where(
+            member_sizes > 1, -max_spread + 2 * max_spread * member_pos / np.maximum(member_sizes - 1, 1), 0.0
+        )
+
+        # Add small random jitter to prevent perfect alignment
+        jitter = rng.normal(0, 1.0, size=(len(names), 2)) * np.array([0.02, 0.01])
+        x = 0.5 + x_positions + jitter[:, 0]
+        y = 1 - vertical_padding - rows * spacing + jitter[:, 1]
+
+        if names:
+            # One scatter call per center, colored per point by community
+            ax.scatter(x, y, color=community_colors[comm_ids], s=100, alpha=0.6)
+
+        # Add labels (first name only); matplotlib has no batch annotate
+        for first_name, x_pos, y_pos in zip([name.split()[0] for name in names], x.tolist(), y.tolist()):
+            ax.annotate(first_name, (x_pos, y_pos), xytext=(5, 5), textcoords='offset points', fontsize=8, alpha=0.7)
+        center_communities[center_name] = [comm_id for comm_id, _ in sorted_communities]
 
         # Customize subplot
         ax.set_title(f'{center_name}\n({len(center_youth)} youth)')
@@ -126,7 +129,13 @@ def create_friend_network_visualization(
         ax.spines['left'].set_visible(False)
 
     # Add legend to the right of the subplots
-    handles, labels = axes[-1].get_legend_handles_labels()
+    # Points are no longer one artist per community, so the legend (for the last center, as before) uses proxies
+    legend_communities = center_communities[center_names[-1]]
+    handles = [
+        Line2D([], [], linestyle='', marker='o', markersize=10, color=community_colors[comm_id], alpha=0.6)
+        for comm_id in legend_communities
+    ]
+    labels = [f'Community {comm_id + 1}' for comm_id in legend_communities]
     fig.legend(handles, labels, title='Friend Communities', loc='center right', bbox_to_anchor=(1.15, 0.5))
 
     plt.suptitle('Friend Communities by Center Assignment', y=1.02, fontsize=14)
@@ -1,58 +1,73 @@
 import polars as pl
+import numpy as np
 import os
-from ortools.sat.python import cp_model
 from src.models import Youth, Center
 
 
 def write_results_to_csv(
-    solver: cp_model.CpSolver,
-    person_crew: dict[tuple[str, str, str], int],
+    assignments: np.ndarray,
     youth_list: list[Youth],
     centers: list[Center],
     year: int,
 ) -> None:
-    """Write all assignments and participant info to a CSV file."""
+    """Write all assignments and participant info to a CSV file.
+
+    assignments is the (num_youth, 2) (center_idx, crew_idx) array from extract_assignments, so the
+    solver is not queried again here.
+    """
     output_path = f'./data/results/assignments_{year}.csv'
     # Create results directory if it doesn't exist
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
-    rows = []
+    center_names = [center.name for center in centers]
+    crew_names = [[crew.name for crew in center.crews] for center in centers]
 
-    # Add youth with their assignments and attributes
-    for center in centers:
-        for crew in center.crews:
-            # Add youth in this crew
-            crew_youth = [
-                youth for youth in youth_list if solver.Value(person_crew[youth.name, center.name, crew.name]) == 1
-            ]
-            for youth in crew_youth:
-                rows.append(
-                    {
-                        'Center': center.name,
-                        'Crew': crew.name,
-                        'Name': youth.name,
-                        'Role': 'Youth',
-                        'Gender': youth.gender,
-                        'Year': youth.year,
-                        'History': youth.history,
-                    }
-                )
+    # Youth with their assignments and attributes, built column by column
+    assigned = np.flatnonzero(assignments[:, 0] >= 0)
+    youth_df = pl.DataFrame(
+        {
+            'center_idx': assignments[assigned, 0],
+            'crew_idx': assignments[assigned, 1],
+            'is_adult': False,
+            'Center': [center_names[ci] for ci in assignments[assigned, 0].tolist()],
+            'Crew': [crew_names[ci][ki] for ci, ki in assignments[assigned].tolist()],
+            'Name': [youth_list[yi].name for yi in assigned.tolist()],
+            'Role': 'Youth',
+            'Gender': [youth_list[yi].gender for yi in assigned.tolist()],
+            'Year': [youth_list[yi].year for yi in assigned.tolist()],
+            'History': [youth_list[yi].history for yi in assigned.tolist()],
+        }
+    )
 
-            # Add adults in this crew
-            for adult in crew.adults:
-                rows.append(
-                    {
-                        'Center': center.name,
-                        'Crew': crew.name,
-                        'Name': adult,
-                        'Role': 'Adult',
-                        'Gender': '',
-                        'Year': '',
-                        'History': '',
-                    }
-                )
+    # Adults in each crew
+    adult_ci, adult_ki, adult_center, adult_crew, adult_name = [], [], [], [], []
+    for ci, center in enumerate(centers):
+        for ki, crew in enumerate(center.crews):
+            adult_ci.extend([ci] * len(crew.adults))
+            adult_ki.extend([ki] * len(crew.adults))
+            adult_center.extend([center.name] * len(crew.adults))
+            adult_crew.extend([crew.name] * len(crew.adults))
+            adult_name.extend(crew.adults)
+    adults_df = pl.DataFrame(
+        {
+            'center_idx': np.array(adult_ci, dtype=assignments.dtype),
+            'crew_idx': np.array(adult_ki, dtype=assignments.dtype),
+            'is_adult': True,
+            'Center': adult_center,
+            'Crew': adult_crew,
+            'Name': adult_name,
+            'Role': 'Adult',
+            'Gender': '',
+            'Year': '',
+            'History': '',
+        }
+    )
 
-    # Convert to DataFrame and write to CSV
-    results_df = pl.DataFrame(rows)
+    # Crew by crew, youth (in youth list order) before adults; the stable sort keeps the original orders
+    results_df = (
+        pl.concat([youth_df, adults_df])
+        .sort('center_idx', 'crew_idx', 'is_adult', maintain_order=True)
+        .drop('center_idx', 'crew_idx', 'is_adult')
+    )
     results_df.write_csv(output_path)
     print(f'\nResults written to {output_path}')